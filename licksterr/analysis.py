@@ -7,7 +7,6 @@ from fractions import Fraction
 from pathlib import Path
 
 import guitarpro as gp
-from mingus.core import notes
 
 from licksterr.exceptions import BadTabException
 from licksterr.key_finder import KeyFinder
@@ -59,15 +58,19 @@ def parse_track(song, track, tempo):
     Iterates the track beat by beat and checks for matches
     """
     logger.info(f"Parsing track {track.name}")
-    tuning = [notes.note_to_int(str(string)[0]) for string in track.strings]
+    tuning = get_tuning(track)
     measure_match = defaultdict(list)  # measure: list of indexes the measure occupies in the track
     keyfinder = KeyFinder()
     note_durations = [0] * 12
     segment_duration = 0
+    known_beats = {}  # (notes, duration): Beat, repeated beats are resolved without hitting the database again
     for i, m in enumerate(track.measures):
         beats = []
         for beat in m.voices[0].beats:  # fixme handle multiple voices
-            beat = Beat.get_or_create(beat)
+            signature = (tuple(sorted((note.string, note.value) for note in beat.notes)), beat.duration.value)
+            if signature not in known_beats:
+                known_beats[signature] = Beat.get_or_create(beat)
+            beat = known_beats[signature]
             beats.append(beat)
             # k-s analysis
             beat_duration = Fraction(1 / beat.duration)
@@ -98,5 +101,10 @@ def parse_track(song, track, tempo):
     return track
 
 
+def get_tuning(track):
+    """Pitch classes of the open strings of a track, from the highest string to the lowest"""
+    return [string.value % 12 for string in track.strings]  # value is the midi number of the open string
+
+
 if __name__ == '__main__':
     pass
@@ -1,5 +1,6 @@
 import logging
 from collections import deque, defaultdict
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
@@ -63,13 +64,25 @@ class KeyFinder:
         self.leaves = next_gen
 
     def get_segment_score(self, durations):
-        scores = [0] * 24
         if self.flat:
-            durations = [1 if duration else 0 for duration in durations]
+            # Only presence matters: the segment boils down to a 12-bit mask of the pitch classes played in it
+            mask = sum(1 << pitch_class for pitch_class, duration in enumerate(durations) if duration)
+            return list(self.get_flat_segment_score(mask))
+        return self.get_weighted_segment_score(durations)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_flat_segment_score(cls, mask):
+        """Scores of a flat segment. There are only 4096 possible masks, so each one is computed just once."""
+        return tuple(cls.get_weighted_segment_score([mask >> pitch_class & 1 for pitch_class in range(12)]))
+
+    @classmethod
+    def get_weighted_segment_score(cls, durations):
+        scores = [0] * 24
         durations = deque(durations)
         for i in range(12):
-            scores[i] += self.dot(durations, self.MAJOR_PROFILES)
-            scores[i + 12] += self.dot(durations, self.MINOR_PROFILES)
+            scores[i] += cls.dot(durations, cls.MAJOR_PROFILES)
+            scores[i + 12] += cls.dot(durations, cls.MINOR_PROFILES)
             durations.rotate(-1)
         return scores
 
@@ -81,6 +94,8 @@ class KeyFinder:
 
 
 class Node:
+    __slots__ = ('key', 'score', 'parent')  # 24 nodes are created for every measure of every track
+
     def __init__(self, key, score, **kwargs):
         super().__init__(**kwargs)
         self.key = key
@@ -1,8 +1,8 @@
-import bisect
 import logging
 from collections import defaultdict
 from enum import Enum
 from fractions import Fraction
+from functools import lru_cache
 
 from flask_sqlalchemy import SQLAlchemy
 from mingus.core import notes, scales
@@ -30,6 +30,7 @@ class Scale(Enum):
 
 
 NOTES_DICT = {notes.int_to_note(value, accidental): value for value in range(12) for accidental in ('#', 'b')}
+NOTE_NAMES = tuple(notes.int_to_note(value) for value in range(12))  # pitch class -> note name
 
 KEYS = tuple((value, is_major) for is_major in (True, False) for value in range(12))
 KEY_NAMES = tuple('C')
@@ -56,19 +57,34 @@ STANDARD_TUNING = [4, 11, 7, 2, 9, 4]
 FLOAT_PRECISION = 5
 
 
+@lru_cache(maxsize=None)
+def _pitch_class(name):
+    """Pitch class of a note name as parsed by mingus, memoized since the same few names are parsed over and over"""
+    return notes.note_to_int(name)
+
+
 class String:
     FRETS = 23
 
     def __init__(self, tuning):
         if not 0 <= tuning < 12:
             raise ValueError(f"Tuning must be an integer in [0, 11].")
-        self.notes = tuple(notes.int_to_note((tuning + fret) % 12) for fret in range(self.FRETS))
+        self.pitch_classes = tuple((tuning + fret) % 12 for fret in range(self.FRETS))
+        self.notes = tuple(NOTE_NAMES[pitch_class] for pitch_class in self.pitch_classes)
+        pitch_class_frets = defaultdict(list)
+        for fret, pitch_class in enumerate(self.pitch_classes):
+            pitch_class_frets[pitch_class].append(fret)
+        self.pitch_class_frets = {pitch_class: tuple(frets) for pitch_class, frets in pitch_class_frets.items()}
+        # closest_frets[pitch_class][fret] is the fret playing pitch_class nearest to fret (the lowest one on ties)
+        self.closest_frets = tuple(
+            tuple(min(self.pitch_class_frets[pitch_class], key=lambda x: abs(fret - x)) for fret in range(self.FRETS))
+            for pitch_class in range(12))
 
     def __getitem__(self, item):
         if isinstance(item, int):
             return self.notes[item]
         else:
-            return self.get_notes([item])
+            return self.pitch_class_frets[_pitch_class(item)]
 
     def __iter__(self):
         for fret, note in enumerate(self.notes):
@@ -77,9 +93,88 @@ class String:
     def __str__(self):
         return str(self.notes)
 
+    def get_first_fret(self, pitch_class, lowest=0):
+        """Returns the first fret >= lowest that plays the given pitch class"""
+        fret = lowest + (pitch_class - self.pitch_classes[0] - lowest) % 12
+        if fret >= self.FRETS:
+            raise ValueError(f"No fret after {lowest} plays pitch class {pitch_class}.")
+        return fret
+
     def get_notes(self, note_list):
         """Returns a list of fret positions that match the notes given as input"""
-        return tuple(fret for fret, n1 in self if any(notes.is_enharmonic(n1, n2) for n2 in note_list))
+        pitch_classes = {_pitch_class(note) for note in note_list}
+        return tuple(sorted(fret for pitch_class in pitch_classes for fret in self.pitch_class_frets[pitch_class]))
+
+
+# Strings of a guitar in standard tuning, indexed from 1 (high E) to 6 (low E)
+STANDARD_STRINGS = (None,) + tuple(String(note) for note in STANDARD_TUNING)
+# Indexes of string for each root form
+ROOT_FORMS = {
+    'C': (2, 5),
+    'A': (5, 3),
+    'G': (3, 1, 6),
+    'E': (1, 6, 4),
+    'D': (4, 2),
+}
+
+
+@lru_cache(maxsize=None)
+def _scale_notes(key, scale):
+    """Notes of the scale built on key, computed by mingus just once for every retry of the same form"""
+    return tuple(scale(key).ascending())
+
+
+@lru_cache(maxsize=None)
+def _caged_form_notes(key, scale, form, form_start=0):
+    """
+    Calculates the (string, fret) pairs belonging to this shape. The result only depends on the arguments, so it's
+    cached (recursive calls included). This is done as follows:
+    Find the notes on the 6th string belonging to the scale, and pick the first one that is on a fret >= form_start.
+    Then progressively build the scale, go to the next string if the distance between the start and the note is
+    greater than 3 frets (the pinkie would have to stretch and it's easier to get that note going down a string).
+    If by the end not all the roots are included in the form, call the function again and start on an higher fret.
+    """
+    strings = STANDARD_STRINGS
+    l_string = ROOT_FORMS[form][0]  # string that has the leftmost root
+    r_strings = ROOT_FORMS[form][1:]  # other strings
+    notes_list = []
+    key_pitch_class = _pitch_class(key)
+    roots = [(l_string, strings[l_string].get_first_fret(key_pitch_class, form_start))]
+    roots.extend((string, strings[string].get_first_fret(key_pitch_class, roots[0][1])) for string in r_strings)
+    scale_notes = _scale_notes(key, scale)
+    candidates = strings[6].get_notes(scale_notes)
+    # picks the first note that is inside the form
+    notes_list.append(next((6, fret) for fret in candidates if fret >= form_start))
+    start = notes_list[0][1]
+    # Every form_start up to the first note and the leftmost root yields this same attempt: on failure, skip past them
+    next_start = min(start, roots[0][1]) + 1
+    for i in range(6, 0, -1):
+        string = strings[i]
+        if i == 1:
+            # Removes the note added on the high E and just copy-pastes the low E
+            notes_list.pop()
+            # Copies the remaining part of the low E in the high E
+            for note, fret in ((s, fret) for s, fret in notes_list.copy() if s == 6):
+                notes_list.append((1, fret))
+            break
+        for fret in string.get_notes(scale_notes):
+            if fret <= start:
+                continue
+            # picks the note on the higher string that is closer to the current position of the index finger
+            higher_string_fret = strings[i - 1].closest_frets[string.pitch_classes[fret]][start]
+            # No note is present in a feasible position on the higher string.
+            if higher_string_fret > fret:
+                return _caged_form_notes(key, scale, form, form_start=next_start)
+            # A note is too far if the pinkie has to go more than 3 frets away from the index finger
+            if fret - start > 3:
+                notes_list.append((i - 1, higher_string_fret))
+                start = higher_string_fret
+                break
+            else:
+                notes_list.append((i, fret))
+    if not set(roots).issubset(notes_list):
+        return _caged_form_notes(key, scale, form, form_start=next_start)
+    return tuple(notes_list)
 
 
 class Song(db.Model):
@@ -161,7 +256,7 @@ class Track(db.Model):
         info['match'] = []
         for k in self.keys:
             key, is_major = KEYS[k]
-            key_result = {'key': notes.int_to_note(key), 'isMajor': is_major, 'forms': defaultdict(float)}
+            key_result = {'key': NOTE_NAMES[key], 'isMajor': is_major, 'forms': defaultdict(float)}
             for tf in TrackForm.get_forms(self):
                 if tf.form.key == key:
                     key_result['forms'][tf.form.name] = tf.match
@@ -186,11 +281,9 @@ class Form(db.Model):
     def __init__(self, note_list, key, scale, name, transpose=False, **kwargs):
         if transpose:
             # Copy-pastes this shape along the fretboard. 11 is excluded because a guitar goes just up the 22th fret
-            for string, fret in list(note_list):
-                if fret < 11:
-                    bisect.insort(note_list, (string, fret + 12))
-                elif fret > 11:
-                    bisect.insort(note_list, (string, fret - 12))
+            shifted = tuple((string, fret + 12 if fret < 11 else fret - 12) for string, fret in note_list if fret != 11)
+            # Order is irrelevant since notes are stored as FormNote rows: just drop duplicates in linear time
+            note_list = dict.fromkeys(tuple(note_list) + shifted)
         note_list = tuple(Note.get(string, fret) for string, fret in note_list)
         super().__init__(key=key, scale=scale, name=name, **kwargs)
         for note in note_list:
@@ -214,61 +307,9 @@ class Form(db.Model):
 
     @classmethod
     def calculate_caged_form(cls, key, scale, form, form_start=0, transpose=False):
-        """
-        Calculates the notes belonging to this shape. This is done as follows:
-        Find the notes on the 6th string belonging to the scale, and pick the first one that is on a fret >= form_start.
-        Then progressively build the scale, go to the next string if the distance between the start and the note is
-        greater than 3 frets (the pinkie would have to stretch and it's easier to get that note going down a string).
-        If by the end not all the roots are included in the form, call the function again and start on an higher fret.
-        """
-        strings = (None,) + tuple(String(note) for note in STANDARD_TUNING)
-        # Indexes of string for each root form
-        root_forms = {
-            'C': (2, 5),
-            'A': (5, 3),
-            'G': (3, 1, 6),
-            'E': (1, 6, 4),
-            'D': (4, 2),
-        }
-        l_string = root_forms[form][0]  # string that has the leftmost root
-        r_strings = root_forms[form][1:]  # other strings
-        notes_list = []
-        roots = [next((l_string, fret) for fret in strings[l_string][key] if fret >= form_start)]
-        roots.extend(next((string, fret) for fret in strings[string][key] if fret >= roots[0][1])
-                     for string in r_strings)
-        scale_notes = scale(key).ascending()
-        candidates = strings[6].get_notes(scale_notes)
-        # picks the first note that is inside the form
-        notes_list.append(next((6, fret) for fret in candidates if fret >= form_start))
-        start = notes_list[0][1]
-        for i in range(6, 0, -1):
-            string = strings[i]
-            if i == 1:
-                # Removes the note added on the high E and just copy-pastes the low E
-                notes_list.pop()
-                # Copies the remaining part of the low E in the high E
-                for note, fret in ((s, fret) for s, fret in notes_list.copy() if s == 6):
-                    notes_list.append((1, fret))
-                break
-            for fret in string.get_notes(scale_notes):
-                if fret <= start:
-                    continue
-                # picks the note on the higher string that is closer to the current position of the index finger
-                higher_string_fret = min(strings[i - 1].get_notes([string.notes[fret]]),
-                                         key=lambda x: abs(start - x))
-                # No note is present in a feasible position on the higher string.
-                if higher_string_fret > fret:
-                    return cls.calculate_caged_form(key, scale, form, form_start=form_start + 1, transpose=transpose)
-                # A note is too far if the pinkie has to go more than 3 frets away from the index finger
-                if fret - start > 3:
-                    notes_list.append((i - 1, higher_string_fret))
-                    start = higher_string_fret
-                    break
-                else:
-                    notes_list.append((i, fret))
-        if not set(roots).issubset(set(notes_list)):
-            return cls.calculate_caged_form(key, scale, form, form_start=form_start + 1, transpose=transpose)
-        key = notes.note_to_int(key)
+        """Builds the form for the given CAGED shape, see _caged_form_notes for how the notes are picked."""
+        notes_list = _caged_form_notes(key, scale, form, form_start)
+        key = _pitch_class(key)
         scale = getattr(Scale, scale.__name__.upper())
         return cls(notes_list, key, scale, form, transpose=transpose)
 
@@ -334,15 +375,15 @@ class Beat(db.Model):
     def get_or_create(cls, beat):
         if len(beat.notes) > 6:
             raise ValueError("Can't have more than two notes per string!")
-        notes = tuple(Note.get(note.string, note.value)
-                      for note in sorted(beat.notes, key=lambda note: (note.string, note.value)))
-        id = ''.join(repr(note) for note in notes) + f'D{beat.duration.value:02}'
+        positions = sorted((note.string, note.value) for note in beat.notes)
+        # The id is built from the raw positions, so notes are only fetched when a new beat has to be created
+        id = ''.join(Note.to_id(string, fret) for string, fret in positions) + f'D{beat.duration.value:02}'
         b = Beat.query.get(id)
         if not b:
             b = Beat(id=id, duration=beat.duration.value)
             db.session.add(b)
-            for note in notes:
-                db.session.add(BeatNote(beat=b, note=note))
+            for string, fret in positions:
+                db.session.add(BeatNote(beat=b, note=Note.get(string, fret)))
         return b
 
 
@@ -359,11 +400,16 @@ class Note(db.Model):
     forms = association_proxy('note_to_form', 'form')
 
     def __repr__(self):
-        return f"S{self.string}F{self.fret:02}" + ('M' if self.muted else 'P')
+        return self.to_id(self.string, self.fret, self.muted)
 
     def to_dict(self):
         return row2dict(self)
 
+    @staticmethod
+    def to_id(string, fret, muted=False):
+        """Textual key of a note ('SxFyyP'), used to compose beat ids"""
+        return f"S{string}F{fret:02}" + ('M' if muted else 'P')
+
     @classmethod
     def get(cls, string, fret, muted=False):
         return cls.query.filter_by(string=string, fret=fret, muted=muted).first()
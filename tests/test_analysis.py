@@ -0,0 +1,18 @@
+import unittest
+
+import guitarpro as gp
+
+from licksterr.analysis import get_tuning
+from licksterr.models import STANDARD_TUNING
+from tests import TEST_ASSETS
+
+
+class TestTuning(unittest.TestCase):
+    def test_standard_tuning(self):
+        song = gp.parse(str(TEST_ASSETS / 'test.gp5'))
+        self.assertEqual(STANDARD_TUNING, get_tuning(song.tracks[0]))
+
+    def test_sharp_tuning(self):
+        # C# strings used to be read as C since only the first character of 'C#4' was parsed
+        track = gp.Track(gp.Song(), strings=[gp.GuitarString(1, 61), gp.GuitarString(2, 56)])
+        self.assertEqual([1, 8], get_tuning(track))
@@ -0,0 +1,38 @@
+import unittest
+
+from mingus.core import scales
+
+from licksterr.models import String, STANDARD_STRINGS, _caged_form_notes
+
+
+class TestString(unittest.TestCase):
+    def test_first_fret(self):
+        high_e = STANDARD_STRINGS[1]
+        self.assertEqual(0, high_e.get_first_fret(4))
+        self.assertEqual(12, high_e.get_first_fret(4, 1))
+        self.assertEqual(22, high_e.get_first_fret(2, 15))
+        with self.assertRaises(ValueError):
+            high_e.get_first_fret(4, 13)  # next E would be on fret 24
+
+    def test_closest_frets(self):
+        string = String(4)
+        # F# is on frets 2 and 14: from fret 8 both are 6 frets away and the lower one wins
+        self.assertEqual(2, string.closest_frets[6][8])
+        self.assertEqual(14, string.closest_frets[6][9])
+        self.assertEqual(5, string.closest_frets[9][3])
+
+
+class TestCagedForm(unittest.TestCase):
+    def test_aeolian_a(self):
+        c_form = ((1, 10), (1, 12), (1, 13), (2, 10), (2, 12), (2, 13), (3, 9), (3, 10), (3, 12), (4, 9), (4, 10),
+                  (4, 12), (5, 10), (5, 12), (6, 10), (6, 12), (6, 13))
+        e_form = ((1, 5), (1, 7), (1, 8), (2, 5), (2, 6), (2, 8), (3, 4), (3, 5), (3, 7), (4, 5), (4, 7), (5, 5),
+                  (5, 7), (5, 8), (6, 5), (6, 7), (6, 8))
+        self.assertEqual(c_form, tuple(sorted(_caged_form_notes('A', scales.Aeolian, 'C'))))
+        self.assertEqual(e_form, tuple(sorted(_caged_form_notes('A', scales.Aeolian, 'E'))))
+
+    def test_form_start(self):
+        # Starting past the shape of the lower octave picks the same shape an octave higher
+        e_form = sorted(_caged_form_notes('A', scales.Aeolian, 'E'))
+        higher = sorted(_caged_form_notes('A', scales.Aeolian, 'E', form_start=6))
+        self.assertEqual([(string, fret + 12) for string, fret in e_form], higher)